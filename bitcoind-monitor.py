@@ -7,39 +7,74 @@ import os
 import signal
 import subprocess
 import sys
+import threading
+import traceback
 
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
 
 try:
     from urllib.parse import quote
 except ImportError:
     from urllib import quote
 
+import requests
 import riprova
 
-from bitcoin.rpc import InWarmupError, Proxy
-from prometheus_client import start_http_server, Gauge, Counter
+from bitcoin.rpc import InWarmupError, JSONRPCError
+from requests.adapters import HTTPAdapter
+from prometheus_client import start_http_server, Gauge, Counter, REGISTRY
+
+try:
+    # Optional: push-driven block updates (see BITCOIN_ZMQ_ADDRESS).
+    import zmq
+except ImportError:
+    zmq = None
+
+try:
+    # Decoding large RPC responses (fallback getblock, getchaintips,
+    # listbanned) with the stdlib json module is the dominant CPU cost after
+    # the network; orjson decodes the same payloads several times faster. It
+    # parses amounts as floats rather than Decimal, which is fine here: every
+    # value ends up in a float-valued Prometheus gauge.
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class CachedGauge(object):
+    """Gauge wrapper that skips set() when the value is unchanged.
+
+    Worthwhile for slow-changing values: under multiprocess mode every set()
+    dirties a memory-mapped page even when nothing changed."""
+
+    def __init__(self, gauge):
+        self._gauge = gauge
+        self._last = None
+
+    def set(self, value):
+        if value != self._last:
+            self._last = value
+            self._gauge.set(value)
 
 
 # Create Prometheus metrics to track bitcoind stats.
-BITCOIN_BLOCKS = Gauge('bitcoin_blocks', 'Block height')
-BITCOIN_DIFFICULTY = Gauge('bitcoin_difficulty', 'Difficulty')
+BITCOIN_BLOCKS = CachedGauge(Gauge('bitcoin_blocks', 'Block height'))
+BITCOIN_DIFFICULTY = CachedGauge(Gauge('bitcoin_difficulty', 'Difficulty'))
 BITCOIN_PEERS = Gauge('bitcoin_peers', 'Number of peers')
 BITCOIN_HASHPS_NEG1 = Gauge('bitcoin_hashps_neg1', 'Estimated network hash rate per second since the last difficulty change')
 BITCOIN_HASHPS_1 = Gauge('bitcoin_hashps_1', 'Estimated network hash rate per second for the last block')
 BITCOIN_HASHPS = Gauge('bitcoin_hashps', 'Estimated network hash rate per second for the last 120 blocks')
 
-BITCOIN_ESTIMATED_SMART_FEE_GAUGES = {}
-
 BITCOIN_WARNINGS = Counter('bitcoin_warnings', 'Number of network or blockchain warnings detected')
 BITCOIN_UPTIME = Gauge('bitcoin_uptime', 'Number of seconds the Bitcoin daemon has been running')
 
-BITCOIN_MEMINFO_USED = Gauge('bitcoin_meminfo_used', 'Number of bytes used')
-BITCOIN_MEMINFO_FREE = Gauge('bitcoin_meminfo_free', 'Number of bytes available')
-BITCOIN_MEMINFO_TOTAL = Gauge('bitcoin_meminfo_total', 'Number of bytes managed')
-BITCOIN_MEMINFO_LOCKED = Gauge('bitcoin_meminfo_locked', 'Number of bytes locked')
-BITCOIN_MEMINFO_CHUNKS_USED = Gauge('bitcoin_meminfo_chunks_used', 'Number of allocated chunks')
-BITCOIN_MEMINFO_CHUNKS_FREE = Gauge('bitcoin_meminfo_chunks_free', 'Number of unused chunks')
+BITCOIN_MEMINFO_USED = CachedGauge(Gauge('bitcoin_meminfo_used', 'Number of bytes used'))
+BITCOIN_MEMINFO_FREE = CachedGauge(Gauge('bitcoin_meminfo_free', 'Number of bytes available'))
+BITCOIN_MEMINFO_TOTAL = CachedGauge(Gauge('bitcoin_meminfo_total', 'Number of bytes managed'))
+BITCOIN_MEMINFO_LOCKED = CachedGauge(Gauge('bitcoin_meminfo_locked', 'Number of bytes locked'))
+BITCOIN_MEMINFO_CHUNKS_USED = CachedGauge(Gauge('bitcoin_meminfo_chunks_used', 'Number of allocated chunks'))
+BITCOIN_MEMINFO_CHUNKS_FREE = CachedGauge(Gauge('bitcoin_meminfo_chunks_free', 'Number of unused chunks'))
 
 BITCOIN_MEMPOOL_BYTES = Gauge('bitcoin_mempool_bytes', 'Size of mempool in bytes')
 BITCOIN_MEMPOOL_SIZE = Gauge('bitcoin_mempool_size', 'Number of unconfirmed transactions in mempool')
@@ -62,13 +97,22 @@ BITCOIN_LATEST_BLOCK_VALUE = Gauge('bitcoin_latest_block_value', 'Bitcoin value
 BITCOIN_BAN_CREATED = Gauge('bitcoin_ban_created', 'Time the ban was created', labelnames=['address', 'reason'])
 BITCOIN_BANNED_UNTIL = Gauge('bitcoin_banned_until', 'Time the ban expires', labelnames=['address', 'reason'])
 
-BITCOIN_SERVER_VERSION = Gauge('bitcoin_server_version', 'The server version')
-BITCOIN_PROTOCOL_VERSION = Gauge('bitcoin_protocol_version', 'The protocol version of the server')
+# Labeled children per (address, reason); Gauge.labels() builds and hashes a
+# label dict on every call, which adds up on long ban lists.
+_BAN_GAUGES = {}
+# (address, reason) -> (ban_created, banned_until) as of the last refresh, so
+# unchanged bans are skipped and lifted bans are dropped from the registry.
+_prev_bans = {}
+
+BITCOIN_SERVER_VERSION = CachedGauge(Gauge('bitcoin_server_version', 'The server version'))
+BITCOIN_PROTOCOL_VERSION = CachedGauge(Gauge('bitcoin_protocol_version', 'The protocol version of the server'))
 
-BITCOIN_SIZE_ON_DISK = Gauge('bitcoin_size_on_disk', 'Estimated size of the block and undo files')
+BITCOIN_SIZE_ON_DISK = CachedGauge(Gauge('bitcoin_size_on_disk', 'Estimated size of the block and undo files'))
 
 EXPORTER_ERRORS = Counter('bitcoin_exporter_errors', 'Number of errors encountered by the exporter', labelnames=['type'])
 PROCESS_TIME = Counter('bitcoin_exporter_process_time', 'Time spent processing metrics from bitcoin node')
+EXPORTER_LAST_REFRESH = Gauge('bitcoin_exporter_last_refresh_seconds',
+                              'Unix timestamp of the refresh the exported samples came from')
 
 
 BITCOIN_RPC_SCHEME = os.environ.get('BITCOIN_RPC_SCHEME', 'http')
@@ -81,13 +125,52 @@ REFRESH_SECONDS = float(os.environ.get('REFRESH_SECONDS', '300'))
 METRICS_PORT = int(os.environ.get('METRICS_PORT', '8334'))
 RETRIES = int(os.environ.get('RETRIES', 5))
 TIMEOUT = int(os.environ.get('TIMEOUT', 30))
+RPC_THREADS = int(os.environ.get('RPC_THREADS', 8))
+# Full getnetworkinfo is only polled every Nth refresh; the version fields it
+# carries are static for the daemon's lifetime and the peer count is available
+# from the much cheaper getconnectioncount.
+NETWORKINFO_REFRESHES = int(os.environ.get('NETWORKINFO_REFRESHES', 20))
+# getchaintips returns a dict per known branch (potentially hundreds) just to
+# be counted, and the count changes slowly; poll it every Nth refresh.
+CHAINTIPS_REFRESHES = int(os.environ.get('CHAINTIPS_REFRESHES', 12))
+# The getmemoryinfo locked-pool numbers move slowly ('total' and 'locked' are
+# essentially static); poll them every Nth refresh.
+MEMINFO_REFRESHES = int(os.environ.get('MEMINFO_REFRESHES', 4))
+# Optional bitcoind -zmqpubhashblock endpoint (e.g. tcp://localhost:28332).
+# When set (and pyzmq is installed), latest-block metrics are refreshed the
+# moment a block is announced instead of waiting for the next scrape.
+BITCOIN_ZMQ_ADDRESS = os.environ.get('BITCOIN_ZMQ_ADDRESS')
+
+# SMART_FEES is fixed at startup, so all of its gauges can be created up
+# front instead of lazily on first use.
+BITCOIN_ESTIMATED_SMART_FEE_GAUGES = {
+    num_blocks: Gauge(
+        'bitcoin_est_smart_fee_%d' % num_blocks,
+        'Estimated smart fee per kilobyte for confirmation in %d blocks' % num_blocks
+    )
+    for num_blocks in SMART_FEES
+}
+
+# The RPC calls made during a refresh are almost entirely independent of each
+# other, so issue them concurrently instead of paying one full round-trip per
+# call. bitcoind serves JSON-RPC requests on concurrent connections.
+RPC_POOL = ThreadPoolExecutor(max_workers=RPC_THREADS)
 
 
 RETRY_EXCEPTIONS = (
     InWarmupError,
-    ConnectionRefusedError,
+    ConnectionError,
+    requests.exceptions.ConnectionError,
 )
 
+# Shared keep-alive session for all JSON-RPC traffic, with the connection
+# pool sized to the RPC thread pool so every worker can hold its own
+# persistent connection to bitcoind.
+_RPC_SESSION = requests.Session()
+_RPC_ADAPTER = HTTPAdapter(pool_connections=RPC_THREADS, pool_maxsize=RPC_THREADS)
+_RPC_SESSION.mount('http://', _RPC_ADAPTER)
+_RPC_SESSION.mount('https://', _RPC_ADAPTER)
+
 
 def on_retry(err, next_try):
     err_type = type(err)
@@ -99,13 +182,7 @@ def error_evaluator(e):
     return isinstance(e, RETRY_EXCEPTIONS)
 
 
-@riprova.retry(
-    timeout=TIMEOUT,
-    backoff=riprova.ExponentialBackOff(),
-    on_retry=on_retry,
-    error_evaluator=error_evaluator,
-)
-def bitcoinrpc(*args):
+def service_url():
     host = BITCOIN_RPC_HOST
     if BITCOIN_RPC_USER and BITCOIN_RPC_PASSWORD:
         host = "%s:%s@%s" % (
@@ -115,10 +192,60 @@ def bitcoinrpc(*args):
         )
     if BITCOIN_RPC_PORT:
         host = "%s:%s" % (host, BITCOIN_RPC_PORT)
-    service_url = "%s://%s" % (BITCOIN_RPC_SCHEME, host)
-    proxy = Proxy(service_url=service_url)
-    result = proxy.call(*args)
-    return result
+    return "%s://%s" % (BITCOIN_RPC_SCHEME, host)
+
+
+# The URL only depends on environment variables that never change during the
+# process lifetime, so build it once at import.
+RPC_SERVICE_URL = service_url()
+
+
+def parse_rpc_response(response):
+    # bitcoind reports call failures in the JSON body (with a non-200 status
+    # for single calls), so decode unconditionally; an unparsable body is the
+    # "bad credentials" signature handled by the caller.
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+
+def reply_result(reply):
+    error = reply.get('error')
+    if error is not None:
+        if error.get('code') == -28:
+            raise InWarmupError(error)
+        raise JSONRPCError(error)
+    return reply['result']
+
+
+@riprova.retry(
+    timeout=TIMEOUT,
+    backoff=riprova.ExponentialBackOff(),
+    on_retry=on_retry,
+    error_evaluator=error_evaluator,
+)
+def bitcoinrpc(*args):
+    payload = {'jsonrpc': '2.0', 'id': 0, 'method': args[0], 'params': list(args[1:])}
+    response = _RPC_SESSION.post(RPC_SERVICE_URL, json=payload, timeout=TIMEOUT)
+    return reply_result(parse_rpc_response(response))
+
+
+@riprova.retry(
+    timeout=TIMEOUT,
+    backoff=riprova.ExponentialBackOff(),
+    on_retry=on_retry,
+    error_evaluator=error_evaluator,
+)
+def bitcoinrpc_batch(calls):
+    # bitcoind accepts a JSON-RPC batch array, amortizing one HTTP round-trip
+    # over all calls. Results are returned in the same order as `calls`.
+    payload = [
+        {'jsonrpc': '2.0', 'id': call_id, 'method': call[0], 'params': list(call[1:])}
+        for call_id, call in enumerate(calls)
+    ]
+    response = _RPC_SESSION.post(RPC_SERVICE_URL, json=payload, timeout=TIMEOUT)
+    replies = parse_rpc_response(response)
+    return [reply_result(reply) for reply in sorted(replies, key=itemgetter('id'))]
 
 
 def get_block(block_hash):
@@ -131,68 +258,184 @@ def get_block(block_hash):
     return block
 
 
-def smartfee_gauge(num_blocks):
-    gauge = BITCOIN_ESTIMATED_SMART_FEE_GAUGES.get(num_blocks)
-    if gauge is None:
-        gauge = Gauge(
-            'bitcoin_est_smart_fee_%d' % num_blocks,
-            'Estimated smart fee per kilobyte for confirmation in %d blocks' % num_blocks
+def get_block_stats(block_hash):
+    try:
+        stats = bitcoinrpc(
+            'getblockstats', block_hash,
+            ['height', 'ins', 'outs', 'total_out', 'total_size', 'total_weight', 'txs'],
         )
-        BITCOIN_ESTIMATED_SMART_FEE_GAUGES[num_blocks] = gauge
-    return gauge
+    except JSONRPCError:
+        # bitcoind < 0.17 or a block without undo data; the caller falls back
+        # to aggregating the full block itself.
+        return None
+    except Exception as e:
+        print(e)
+        print('Error: Can\'t retrieve block stats for ' + block_hash + ' from bitcoind.')
+        return None
+    return stats
+
+
+SATOSHIS_PER_BTC = 10 ** 8
+
+_last_block_hash = None
+
+
+def refresh_latest_block(block_hash):
+    global _last_block_hash
+
+    # Blocks arrive every ~10 minutes, so most refresh cycles see the same
+    # tip; the gauges already hold its values and nothing needs re-fetching.
+    if block_hash == _last_block_hash:
+        return
+
+    stats = get_block_stats(block_hash)
+    if stats is not None:
+        # bitcoind aggregates these server-side and the response is a couple
+        # hundred bytes, vs. megabytes of decoded transactions from getblock.
+        BITCOIN_LATEST_BLOCK_SIZE.set(stats['total_size'])
+        BITCOIN_LATEST_BLOCK_TXS.set(stats['txs'])
+        BITCOIN_LATEST_BLOCK_HEIGHT.set(stats['height'])
+        BITCOIN_LATEST_BLOCK_WEIGHT.set(stats['total_weight'])
+        BITCOIN_LATEST_BLOCK_INPUTS.set(stats['ins'])
+        BITCOIN_LATEST_BLOCK_OUTPUTS.set(stats['outs'])
+        BITCOIN_LATEST_BLOCK_VALUE.set(stats['total_out'] / SATOSHIS_PER_BTC)
+        _last_block_hash = block_hash
+        return
+
+    latest_block = get_block(block_hash)
+    if latest_block is None:
+        return
+
+    BITCOIN_LATEST_BLOCK_SIZE.set(latest_block['size'])
+    BITCOIN_LATEST_BLOCK_TXS.set(latest_block['nTx'])
+    BITCOIN_LATEST_BLOCK_HEIGHT.set(latest_block['height'])
+    BITCOIN_LATEST_BLOCK_WEIGHT.set(latest_block['weight'])
+    # Aggregate in single C-level passes instead of a per-tx Python loop;
+    # a full block can hold thousands of transactions.
+    txs = latest_block['tx']
+    inputs = sum(map(len, map(itemgetter('vin'), txs)))
+    vouts = list(map(itemgetter('vout'), txs))
+    outputs = sum(map(len, vouts))
+    # Sum in integer satoshis like bitcoind does internally; native int adds
+    # are faster than Decimal arithmetic and accumulate no rounding error.
+    value_sats = sum(round(out['value'] * SATOSHIS_PER_BTC) for vout in vouts for out in vout)
+
+    BITCOIN_LATEST_BLOCK_INPUTS.set(inputs)
+    BITCOIN_LATEST_BLOCK_OUTPUTS.set(outputs)
+    BITCOIN_LATEST_BLOCK_VALUE.set(value_sats / SATOSHIS_PER_BTC)
+    _last_block_hash = block_hash
+
+
+def do_smartfee(num_blocks, estimate):
+    smartfee = estimate.get('feerate')
+    if smartfee is not None:
+        BITCOIN_ESTIMATED_SMART_FEE_GAUGES[num_blocks].set(smartfee)
 
 
-def do_smartfee(num_blocks):
-    smartfee = bitcoinrpc('estimatesmartfee', num_blocks).get('feerate')
-    if smartfee is not None:
-        gauge = smartfee_gauge(num_blocks)
-        gauge.set(smartfee)
+_refresh_count = 0
 
 
 def refresh_metrics():
-    uptime = int(bitcoinrpc('uptime'))
-    meminfo = bitcoinrpc('getmemoryinfo', 'stats')['locked']
-    blockchaininfo = bitcoinrpc('getblockchaininfo')
-    networkinfo = bitcoinrpc('getnetworkinfo')
-    chaintips = len(bitcoinrpc('getchaintips'))
-    mempool = bitcoinrpc('getmempoolinfo')
-    nettotals = bitcoinrpc('getnettotals')
-    latest_block = get_block(str(blockchaininfo['bestblockhash']))
-    hashps_120 = float(bitcoinrpc('getnetworkhashps', 120))  # 120 is the default
-    hashps_neg1 = float(bitcoinrpc('getnetworkhashps', -1))
-    hashps_1 = float(bitcoinrpc('getnetworkhashps', 1))
-
-    banned = bitcoinrpc('listbanned')
+    global _refresh_count, _prev_bans
+
+    full_networkinfo = _refresh_count % NETWORKINFO_REFRESHES == 0
+    poll_chaintips = _refresh_count % CHAINTIPS_REFRESHES == 0
+    poll_meminfo = _refresh_count % MEMINFO_REFRESHES == 0
+    calls = {
+        'uptime': ('uptime',),
+        'blockchaininfo': ('getblockchaininfo',),
+        'networkinfo': ('getnetworkinfo',) if full_networkinfo else ('getconnectioncount',),
+        'mempool': ('getmempoolinfo',),
+        'nettotals': ('getnettotals',),
+        'hashps_120': ('getnetworkhashps', 120),  # 120 is the default
+        'hashps_neg1': ('getnetworkhashps', -1),
+        'hashps_1': ('getnetworkhashps', 1),
+        'banned': ('listbanned',),
+    }
+    if poll_chaintips:
+        calls['chaintips'] = ('getchaintips',)
+    if poll_meminfo:
+        calls['meminfo'] = ('getmemoryinfo', 'stats')
+
+    # Two concurrent HTTP round-trips instead of ~16 sequential ones: one
+    # batch for the independent info calls, one for the fee estimates.
+    batch_future = RPC_POOL.submit(bitcoinrpc_batch, list(calls.values()))
+    smartfee_future = RPC_POOL.submit(
+        bitcoinrpc_batch, [('estimatesmartfee', num_blocks) for num_blocks in SMART_FEES])
+
+    results = dict(zip(calls, batch_future.result()))
+    blockchaininfo = results['blockchaininfo']
+
+    # Only the latest-block fetch depends on another call; issue it as soon
+    # as getblockchaininfo is in while the smartfee batch stays in flight.
+    refresh_latest_block(str(blockchaininfo['bestblockhash']))
+
+    uptime = int(results['uptime'])
+    if full_networkinfo:
+        networkinfo = results['networkinfo']
+        connections = networkinfo['connections']
+        BITCOIN_SERVER_VERSION.set(networkinfo['version'])
+        BITCOIN_PROTOCOL_VERSION.set(networkinfo['protocolversion'])
+    else:
+        connections = results['networkinfo']
+    mempool = results['mempool']
+    nettotals = results['nettotals']
+    hashps_120 = float(results['hashps_120'])
+    hashps_neg1 = float(results['hashps_neg1'])
+    hashps_1 = float(results['hashps_1'])
+    banned = results['banned']
+
+    for num_blocks, estimate in zip(SMART_FEES, smartfee_future.result()):
+        do_smartfee(num_blocks, estimate)
 
     BITCOIN_UPTIME.set(uptime)
     BITCOIN_BLOCKS.set(blockchaininfo['blocks'])
-    BITCOIN_PEERS.set(networkinfo['connections'])
+    BITCOIN_PEERS.set(connections)
     BITCOIN_DIFFICULTY.set(blockchaininfo['difficulty'])
     BITCOIN_HASHPS.set(hashps_120)
     BITCOIN_HASHPS_NEG1.set(hashps_neg1)
     BITCOIN_HASHPS_1.set(hashps_1)
-    BITCOIN_SERVER_VERSION.set(networkinfo['version'])
-    BITCOIN_PROTOCOL_VERSION.set(networkinfo['protocolversion'])
     BITCOIN_SIZE_ON_DISK.set(blockchaininfo['size_on_disk'])
 
-    for smartfee in SMART_FEES:
-        do_smartfee(smartfee)
-
-    for ban in banned:
-        BITCOIN_BAN_CREATED.labels(address=ban['address'], reason=ban['ban_reason']).set(ban['ban_created'])
-        BITCOIN_BANNED_UNTIL.labels(address=ban['address'], reason=ban['ban_reason']).set(ban['banned_until'])
-
-    if networkinfo['warnings']:
+    current_bans = {
+        (ban['address'], ban['ban_reason']): (ban['ban_created'], ban['banned_until'])
+        for ban in banned
+    }
+    for key, times in current_bans.items():
+        if _prev_bans.get(key) == times:
+            continue
+        gauges = _BAN_GAUGES.get(key)
+        if gauges is None:
+            gauges = _BAN_GAUGES[key] = (
+                BITCOIN_BAN_CREATED.labels(address=key[0], reason=key[1]),
+                BITCOIN_BANNED_UNTIL.labels(address=key[0], reason=key[1]),
+            )
+        gauges[0].set(times[0])
+        gauges[1].set(times[1])
+    for key in _prev_bans.keys() - current_bans.keys():
+        # The ban was lifted or expired; drop the labeled children so the
+        # series disappears instead of exporting stale values forever.
+        _BAN_GAUGES.pop(key, None)
+        BITCOIN_BAN_CREATED.remove(*key)
+        BITCOIN_BANNED_UNTIL.remove(*key)
+    _prev_bans = current_bans
+
+    # getblockchaininfo carries network warnings too, so this stays accurate
+    # on the cycles where getnetworkinfo is skipped.
+    if blockchaininfo['warnings']:
         BITCOIN_WARNINGS.inc()
 
-    BITCOIN_NUM_CHAINTIPS.set(chaintips)
+    if poll_chaintips:
+        BITCOIN_NUM_CHAINTIPS.set(len(results['chaintips']))
 
-    BITCOIN_MEMINFO_USED.set(meminfo['used'])
-    BITCOIN_MEMINFO_FREE.set(meminfo['free'])
-    BITCOIN_MEMINFO_TOTAL.set(meminfo['total'])
-    BITCOIN_MEMINFO_LOCKED.set(meminfo['locked'])
-    BITCOIN_MEMINFO_CHUNKS_USED.set(meminfo['chunks_used'])
-    BITCOIN_MEMINFO_CHUNKS_FREE.set(meminfo['chunks_free'])
+    if poll_meminfo:
+        meminfo = results['meminfo']['locked']
+        BITCOIN_MEMINFO_USED.set(meminfo['used'])
+        BITCOIN_MEMINFO_FREE.set(meminfo['free'])
+        BITCOIN_MEMINFO_TOTAL.set(meminfo['total'])
+        BITCOIN_MEMINFO_LOCKED.set(meminfo['locked'])
+        BITCOIN_MEMINFO_CHUNKS_USED.set(meminfo['chunks_used'])
+        BITCOIN_MEMINFO_CHUNKS_FREE.set(meminfo['chunks_free'])
 
     BITCOIN_MEMPOOL_BYTES.set(mempool['bytes'])
     BITCOIN_MEMPOOL_SIZE.set(mempool['size'])
@@ -201,23 +444,22 @@ def refresh_metrics():
     BITCOIN_TOTAL_BYTES_RECV.set(nettotals['totalbytesrecv'])
     BITCOIN_TOTAL_BYTES_SENT.set(nettotals['totalbytessent'])
 
-    if latest_block is not None:
-        BITCOIN_LATEST_BLOCK_SIZE.set(latest_block['size'])
-        BITCOIN_LATEST_BLOCK_TXS.set(latest_block['nTx'])
-        BITCOIN_LATEST_BLOCK_HEIGHT.set(latest_block['height'])
-        BITCOIN_LATEST_BLOCK_WEIGHT.set(latest_block['weight'])
-        inputs, outputs = 0, 0
-        value = 0
-        for tx in latest_block['tx']:
-            i = len(tx['vin'])
-            inputs += i
-            o = len(tx['vout'])
-            outputs += o
-            value += sum(o["value"] for o in tx['vout'])
-
-        BITCOIN_LATEST_BLOCK_INPUTS.set(inputs)
-        BITCOIN_LATEST_BLOCK_OUTPUTS.set(outputs)
-        BITCOIN_LATEST_BLOCK_VALUE.set(value)
+    _refresh_count += 1
+
+
+def zmq_block_listener(address):
+    context = zmq.Context()
+    socket = context.socket(zmq.SUB)
+    socket.setsockopt_string(zmq.SUBSCRIBE, 'hashblock')
+    socket.connect(address)
+    while True:
+        # Multipart message: topic, block hash, sequence number.
+        parts = socket.recv_multipart()
+        try:
+            refresh_latest_block(parts[1].hex())
+        except Exception as e:
+            print("Refresh from ZMQ block notification failed. Cause: " + str(e))
+            exception_count(e)
 
 
 def sigterm_handler(signal, frame):
@@ -231,28 +473,72 @@ def exception_count(e):
     EXPORTER_ERRORS.labels(**{"type": exception_name}).inc()
 
 
-def main():
-    signal.signal(signal.SIGTERM, sigterm_handler)
-
-    # Start up the server to expose the metrics.
-    start_http_server(METRICS_PORT)
-    while True:
-        process_start = datetime.now()
+class BitcoindCollector(object):
+    """Refreshes the metrics when Prometheus scrapes, at most once per
+    REFRESH_SECONDS. No RPC traffic is generated while nobody is scraping."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_refresh = None
+
+    def collect(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._last_refresh is None or now - self._last_refresh >= REFRESH_SECONDS:
+                self.refresh()
+                self._last_refresh = now
+        # The metrics themselves live in the module-level gauges. Those were
+        # registered at import, before this collector, so the registry reads
+        # them before the refresh above runs: a scrape serves the previous
+        # refresh's values and the refresh triggered here is served by the
+        # next scrape. bitcoin_exporter_last_refresh_seconds carries the
+        # timestamp of the refresh a scrape's samples actually came from, so
+        # staleness after an idle period is visible to alerting.
+        return []
+
+    def refresh(self):
+        process_start = time.monotonic()
 
         # Allow riprova.MaxRetriesExceeded and unknown exceptions to crash the process.
         try:
             refresh_metrics()
+            EXPORTER_LAST_REFRESH.set_to_current_time()
         except riprova.exceptions.RetryError as e:
             print("Refresh failed during retry. Cause: " + str(e))
             exception_count(e)
         except json.decoder.JSONDecodeError as e:
             print("RPC call did not return JSON. Bad credentials? " + str(e))
-            sys.exit(1)
+            # sys.exit would only end the scrape handler thread.
+            os._exit(1)
+        except Exception:
+            # An unknown failure crashes the process, as it did when the
+            # refresh ran on the main loop; letting it propagate would just
+            # fail every scrape with HTTP 500 while the exporter limps on.
+            traceback.print_exc()
+            os._exit(1)
 
-        duration = datetime.now() - process_start
-        PROCESS_TIME.inc(duration.total_seconds())
+        PROCESS_TIME.inc(time.monotonic() - process_start)
 
-        time.sleep(REFRESH_SECONDS)
+
+def main():
+    signal.signal(signal.SIGTERM, sigterm_handler)
+
+    collector = BitcoindCollector()
+    # Prime the gauges before serving so the first scrape sees real values.
+    collector.collect()
+    REGISTRY.register(collector)
+
+    if BITCOIN_ZMQ_ADDRESS:
+        if zmq is None:
+            print('BITCOIN_ZMQ_ADDRESS is set but pyzmq is not installed; block notifications disabled.')
+        else:
+            threading.Thread(
+                target=zmq_block_listener, args=(BITCOIN_ZMQ_ADDRESS,), daemon=True).start()
+
+    # Start up the server to expose the metrics.
+    start_http_server(METRICS_PORT)
+    while True:
+        signal.pause()
 
 
 if __name__ == '__main__':